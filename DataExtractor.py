@@ -1,10 +1,17 @@
 import os
+import csv
+import hashlib
+import threading
+import numpy as np
 import pandas as pd
-import PyPDF2
+import pypdfium2 as pdfium
+import matplotlib
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import streamlit as st
-from io import BytesIO
-from difflib import get_close_matches
+from io import BytesIO, StringIO
+from concurrent.futures import ThreadPoolExecutor
+from rapidfuzz import process, fuzz
 import matplotlib.backends.backend_pdf
 
 st.set_page_config(page_title="Fund Data Extractor", layout="wide")
@@ -18,45 +25,117 @@ uploaded_files = st.file_uploader(
 # ---------- 2. Fuzzy column matcher ----------
 def match_column(possible_names, available_columns):
     for name in possible_names:
-        match = get_close_matches(name.lower(), available_columns, n=1, cutoff=0.6)
+        match = process.extractOne(name.lower(), available_columns, scorer=fuzz.ratio, score_cutoff=60)
         if match:
             return match[0]
     return None
 
+# st.cache_data persists across reruns and sessions, unlike a cache defined in this
+# re-executed script, so files with an already-seen schema skip fuzzy matching
+@st.cache_data(show_spinner=False, max_entries=256)
+def _match_cached(possible_names, available_columns):
+    return match_column(possible_names, available_columns)
+
 # ---------- 3. PDF Parser ----------
-def extract_pdf_data(file):
-    reader = PyPDF2.PdfReader(file)
-    text = "\n".join([page.extract_text() for page in reader.pages])
-    lines = text.split("\n")
-    data = []
-    for line in lines:
-        if "|" in line and "Fund Name" not in line and "---" not in line:
-            parts = [x.strip() for x in line.split("|")]
-            try:
-                fund_name = parts[0]
-                ret = float(parts[1].replace('%', '')) / 100
-                aum = float(parts[2])
-                strategy = parts[3]
-                data.append({
-                    "fund_name": fund_name,
-                    "return": ret,
-                    "aum": aum,
-                    "strategy": strategy
-                })
-            except Exception as e:
-                st.warning(f"Could not parse line: {line} — {e}")
-    return pd.DataFrame(data)
+def _compact_dtypes(df):
+    # Numbers stay float64: AUM needs more than float32's ~7 digits and values are
+    # exported as-is. Labels repeat a lot, so they are stored as categories
+    df["return"] = df["return"].astype("float64")
+    df["aum"] = df["aum"].astype("float64")
+    df["fund_name"] = df["fund_name"].astype("category")
+    df["strategy"] = df["strategy"].astype("category")
+    return df
+
+PDF_COLUMNS = ["fund_name", "return", "aum", "strategy"]
+
+# Returns the parsed frame and the table lines that could not be parsed. Warnings are
+# left to the caller so they are only ever emitted from the script thread
+def _parse_lines(lines):
+    s = pd.Series(lines, dtype=object)
+    mask = (
+        s.str.contains("|", regex=False)
+        & ~s.str.contains("Fund Name", regex=False)
+        & ~s.str.contains("---", regex=False)
+    )
+    candidates = s[mask]
+    if candidates.empty:
+        return _compact_dtypes(pd.DataFrame(columns=PDF_COLUMNS)), []
+    # Pad short rows (e.g. "Page 1 | of 3") to four fields so usecols always finds them;
+    # has_strategy still tells a missing strategy field apart from an empty one
+    separators = candidates.str.count(r"\|")
+    has_strategy = (separators >= len(PDF_COLUMNS) - 1).to_numpy()
+    padded = candidates + (len(PDF_COLUMNS) - 1 - separators).clip(lower=0).map("|".__mul__)
+    df = pd.read_csv(
+        StringIO("\n".join(padded)), sep="|", header=None, names=PDF_COLUMNS,
+        usecols=range(len(PDF_COLUMNS)), skipinitialspace=True,
+        # Labels are read as categories so each distinct name is stored once
+        dtype={"fund_name": "category", "return": str, "aum": str, "strategy": "category"},
+        # Only empty fields are missing; "NA", "None", "-" etc. are real labels
+        keep_default_na=False, na_values=[""],
+        quoting=csv.QUOTE_NONE, engine="c"
+    )
+    # An empty label is kept as "" like split("|") did; a missing strategy field stays NaN
+    df["fund_name"] = df["fund_name"].str.strip().fillna("")
+    strategy = df["strategy"].str.strip()
+    df["strategy"] = strategy.mask(strategy.isna() & has_strategy, "")
+    df["return"] = pd.to_numeric(df["return"].str.replace("%", "", regex=False).str.strip(), errors="coerce") / 100
+    df["aum"] = pd.to_numeric(df["aum"].str.strip(), errors="coerce")
+
+    invalid = df[["return", "aum", "strategy"]].isna().any(axis=1)
+    bad_lines = candidates[invalid.to_numpy()].tolist()
+    return _compact_dtypes(df[~invalid].reset_index(drop=True)), bad_lines
+
+# PDFium is not thread-safe. Streamlit re-executes this script on every rerun and
+# session, so the lock comes from cache_resource to be shared by the whole process
+@st.cache_resource(show_spinner=False)
+def _pdfium_lock():
+    return threading.Lock()
+
+@st.cache_data(show_spinner=False)
+def extract_pdf_data(name, data):
+    # Parsed page by page so only one page's text is held at a time
+    frames, bad_lines = [], []
+    with _pdfium_lock():
+        pdf = pdfium.PdfDocument(data)
+        try:
+            for page in pdf:
+                textpage = page.get_textpage()
+                text = textpage.get_text_range()
+                textpage.close()
+                page.close()
+                page_df, page_bad_lines = _parse_lines(text.splitlines())
+                frames.append(page_df)
+                bad_lines.extend(page_bad_lines)
+        finally:
+            pdf.close()
+    if not frames:
+        return _parse_lines([])
+    # Per-page categories differ, so re-compact after concat
+    return _compact_dtypes(pd.concat(frames, ignore_index=True)), bad_lines
 
 # ---------- 4. Excel Parser ----------
-def extract_excel_data(file):
-    df = pd.read_excel(file)
+@st.cache_data(show_spinner=False)
+def extract_excel_data(name, data):
+    try:
+        df = pd.read_excel(BytesIO(data), engine="calamine")
+    except (ValueError, ImportError):
+        # pandas < 2.2 or python-calamine not installed
+        df = pd.read_excel(BytesIO(data))
     df.columns = [col.strip().lower().replace(" ", "_") for col in df.columns]
     cols = list(df.columns)
+    have = set(cols)
 
-    fund_col = match_column(["fund_name", "fund"], cols)
-    ret_col = match_column(["weekly_return_(%)", "weekly_return", "return", "performance"], cols)
-    aum_col = match_column(["aum", "aum_(m_usd)", "net_assets", "assets"], cols)
-    strat_col = match_column(["strategy", "strat", "approach"], cols)
+    # Columns are already normalized, so only fuzzy-match when no synonym is an exact hit
+    resolved = []
+    for possible_names in (
+        ["fund_name", "fund"],
+        ["weekly_return_(%)", "weekly_return", "return", "performance"],
+        ["aum", "aum_(m_usd)", "net_assets", "assets"],
+        ["strategy", "strat", "approach"],
+    ):
+        exact = next((n for n in possible_names if n in have), None)
+        resolved.append(exact or _match_cached(tuple(possible_names), tuple(cols)))
+    fund_col, ret_col, aum_col, strat_col = resolved
 
     if not all([fund_col, ret_col, strat_col]):
         raise ValueError(f"Missing required columns: fund={fund_col}, return={ret_col}, strategy={strat_col}")
@@ -64,73 +143,119 @@ def extract_excel_data(file):
     df["return"] = df[ret_col].astype(float) / 100
     df["fund_name"] = df[fund_col]
     df["strategy"] = df[strat_col]
-    df["aum"] = df[aum_col] if aum_col else None
+    df["aum"] = df[aum_col].astype("float64") if aum_col else np.full(len(df), np.nan, dtype="float64")
 
-    return df[["fund_name", "return", "aum", "strategy"]]
+    # Same (frame, unparsed lines) shape as extract_pdf_data
+    return _compact_dtypes(df[["fund_name", "return", "aum", "strategy"]]), []
 
 # ---------- 5. Main Execution ----------
+# _frames is not hashed; file_keys identifies the upload set
+@st.cache_data(show_spinner=False)
+def build_combined_df(file_keys, _frames):
+    combined_df = pd.concat(_frames, ignore_index=True)
+    # concat falls back to object when the per-file categories differ
+    combined_df["fund_name"] = combined_df["fund_name"].astype("category")
+    combined_df["strategy"] = combined_df["strategy"].astype("category")
+    # Multiply the raw arrays to skip pandas index alignment
+    combined_df["net_return_usd"] = np.multiply(
+        combined_df["return"].to_numpy(), combined_df["aum"].to_numpy()
+    )
+    return combined_df
+
+# Figure construction is slow, so the rendered report is reused while the upload set is unchanged
+@st.cache_data(show_spinner=False)
+def build_pdf_report(file_keys, _combined_df):
+    pdf_buffer = BytesIO()
+    with matplotlib.backends.backend_pdf.PdfPages(pdf_buffer) as pdf:
+
+        # (all the PDF chart/summary code from previous message goes here...)
+        pass
+
+    return pdf_buffer.getvalue()
+
+def build_excel_report(combined_df):
+    excel_buffer = BytesIO()
+    # No constant_memory: to_excel writes column by column, which that mode silently drops
+    with pd.ExcelWriter(excel_buffer, engine="xlsxwriter") as writer:
+        combined_df.to_excel(writer, index=False)
+    return excel_buffer.getvalue()
+
 all_data = []
+file_keys = []
 
 if uploaded_files:
-    for file in uploaded_files:
-        try:
+    # Workers only parse; every st.* call stays on the script thread
+    with ThreadPoolExecutor(max_workers=min(8, len(uploaded_files))) as executor:
+        jobs = {}
+        for file in uploaded_files:
             if file.name.endswith(".pdf"):
-                df = extract_pdf_data(file)
+                extract = extract_pdf_data
             elif file.name.endswith(".xlsx"):
-                df = extract_excel_data(file)
+                extract = extract_excel_data
             else:
                 continue
+            data = file.getvalue()
+            jobs[executor.submit(extract, file.name, data)] = (file.name, hashlib.md5(data).hexdigest())
+
+        # Collect in upload order so the combined frame is stable across reruns
+        for future, (name, digest) in jobs.items():
+            try:
+                df, bad_lines = future.result()
+            except Exception as e:
+                st.error(f"Error processing {name}: {e}")
+                continue
+            for line in bad_lines:
+                st.warning(f"Could not parse line: {line}")
             all_data.append(df)
-        except Exception as e:
-            st.error(f"Error processing {file.name}: {e}")
+            file_keys.append((name, digest))
 
 # ---------- 6. Visualization ----------
 if all_data:
-    combined_df = pd.concat(all_data, ignore_index=True)
-    combined_df["net_return_usd"] = combined_df["return"] * combined_df["aum"]
+    combined_df = build_combined_df(tuple(file_keys), all_data)
 
     # 1️⃣ Show combined preview
     st.subheader("🔹 Combined Data Preview")
-    st.dataframe(combined_df.tail(10))
+    # Hand Streamlit only the rows shown so it doesn't serialize the whole frame
+    st.dataframe(combined_df.iloc[-10:].reset_index(drop=True))
 
     # 2️⃣ Plot 1 - Avg Return by Fund
     st.subheader("📈 Average Return by Fund")
-    avg_returns = combined_df.groupby("fund_name")["return"].mean()
+    avg_returns = combined_df.groupby("fund_name", observed=True)["return"].mean()
     st.bar_chart(avg_returns)
 
+    # One pass over strategy for both strategy plots
+    by_strategy = combined_df.groupby("strategy", sort=False, observed=True).agg(
+        aum=("aum", "sum"), aum_count=("aum", "count"), ret=("return", "mean")
+    )
+
     # 3️⃣ Plot 2 - AUM by Strategy
     st.subheader("📊 Total AUM by Strategy")
-    aum_by_strategy = combined_df.dropna(subset=["aum"]).groupby("strategy")["aum"].sum()
+    aum_by_strategy = by_strategy.loc[by_strategy["aum_count"] > 0, "aum"]
     st.bar_chart(aum_by_strategy)
 
     # 4️⃣ Plot 3 - Avg Return by Strategy
     st.subheader("📈 Average Return by Strategy")
-    avg_ret_by_strategy = combined_df.groupby("strategy")["return"].mean()
+    avg_ret_by_strategy = by_strategy["ret"]
     st.bar_chart(avg_ret_by_strategy)
 
     # ✅ ⬇️ INSERT PDF EXPORT CODE HERE ⬇️
     st.subheader("📄 Download Summary PDF Report")
 
-    pdf_buffer = BytesIO()
-    pdf = matplotlib.backends.backend_pdf.PdfPages(pdf_buffer)
-
-    # (all the PDF chart/summary code from previous message goes here...)
-
-    pdf.close()
-    pdf_buffer.seek(0)
+    pdf_bytes = build_pdf_report(tuple(file_keys), combined_df)
 
     st.download_button(
         label="📥 Download Summary Report (PDF)",
-        data=pdf_buffer,
+        data=pdf_bytes,
         file_name="summary_report.pdf",
         mime="application/pdf"
     )
 
     # 5️⃣ Excel export
     st.subheader("📤 Download Combined Data")
-    excel_buffer = BytesIO()
-    combined_df.to_excel(excel_buffer, index=False)
-    excel_buffer.seek(0)
-    st.download_button("Download Excel", excel_buffer, file_name="combined_fund_report.xlsx")
+
+    # Passed as a callable so the workbook is only built when the button is clicked
+    st.download_button(
+        "Download Excel", lambda: build_excel_report(combined_df), file_name="combined_fund_report.xlsx"
+    )
 else:
     st.info("Upload PDF or Excel files to extract and visualize data.")
@@ -0,0 +1,34 @@
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from DataExtractor import extract_excel_data, match_column
+
+
+def test_match_column_rejects_unrelated_columns():
+    assert match_column(["aum", "aum_(m_usd)", "net_assets", "assets"], ["fund_name", "weekly_return_%", "strategy"]) is None
+    cols = ["fund", "ret", "investment_style", "date"]
+    assert match_column(["aum", "aum_(m_usd)", "net_assets", "assets"], cols) is None
+    assert match_column(["strategy", "strat", "approach"], cols) is None
+
+
+def test_match_column_accepts_close_names():
+    assert match_column(["fund_name", "fund"], ["fund_nam", "date"]) == "fund_nam"
+
+
+def test_excel_without_aum_column():
+    sheet = pd.DataFrame({
+        "Fund Name": ["A", "B"],
+        "Weekly Return": [1.5, -2.0],
+        "Strategy": ["Macro", "L/S"],
+    })
+    buffer = BytesIO()
+    sheet.to_excel(buffer, index=False)
+
+    df, bad_lines = extract_excel_data("funds.xlsx", buffer.getvalue())
+
+    assert bad_lines == []
+    assert list(df["fund_name"]) == ["A", "B"]
+    np.testing.assert_allclose(df["return"], [0.015, -0.02])
+    assert df["aum"].isna().all()
@@ -0,0 +1,21 @@
+from io import BytesIO
+
+import numpy as np
+import pandas as pd
+
+from DataExtractor import build_excel_report
+
+
+def test_excel_report_round_trips():
+    df = pd.DataFrame({
+        "fund_name": pd.Categorical(["Alpha", "Beta", "Alpha"]),
+        "return": [0.3, 0.052, -0.01],
+        "aum": [1.5e9, np.nan, 123456789.12],
+        "strategy": pd.Categorical(["Macro", "L/S", "NA"]),
+    })
+    df["net_return_usd"] = df["return"] * df["aum"]
+
+    result = pd.read_excel(BytesIO(build_excel_report(df)), keep_default_na=False, na_values=[""])
+
+    expected = df.astype({"fund_name": object, "strategy": object})
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
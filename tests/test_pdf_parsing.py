@@ -0,0 +1,65 @@
+import pandas as pd
+import pytest
+
+from DataExtractor import _parse_lines
+
+
+def test_parses_rows_and_skips_headers():
+    df, bad_lines = _parse_lines([
+        "Fund Name | Return | AUM | Strategy",
+        "----------|--------|-----|---------",
+        "Alpha | 5.2% | 100 | Macro",
+        "Beta|-1.5 %|20.5|L/S",
+        "no pipe here",
+    ])
+
+    assert bad_lines == []
+    assert list(df["fund_name"]) == ["Alpha", "Beta"]
+    assert list(df["return"]) == pytest.approx([0.052, -0.015])
+    assert list(df["aum"]) == [100.0, 20.5]
+    assert list(df["strategy"]) == ["Macro", "L/S"]
+
+
+def test_na_like_and_empty_labels_are_kept():
+    df, bad_lines = _parse_lines([
+        "NA | 1% | 10 | NA",
+        " | 2% | 20 | None",
+        "Gamma | 3% | 30 | -",
+        "Delta | 4% | 40 |",
+    ])
+
+    assert bad_lines == []
+    assert list(df["fund_name"]) == ["NA", "", "Gamma", "Delta"]
+    assert list(df["strategy"]) == ["NA", "None", "-", ""]
+
+
+def test_extra_fields_are_ignored():
+    df, bad_lines = _parse_lines(["Alpha | 1% | 10 | Macro | extra | fields"])
+
+    assert bad_lines == []
+    assert df.iloc[0].tolist() == ["Alpha", pytest.approx(0.01), 10.0, "Macro"]
+
+
+def test_unparseable_and_short_rows_are_reported():
+    lines = ["Alpha | x | 10 | Macro", "Beta | 1% | - | L/S", "Gamma | 1% | 10"]
+    df, bad_lines = _parse_lines(["Delta | 1% | 10 | Macro"] + lines)
+
+    assert list(df["fund_name"]) == ["Delta"]
+    assert bad_lines == lines
+
+
+def test_only_short_rows_does_not_raise():
+    df, bad_lines = _parse_lines(["Page 1 | of 3", "Confidential | 2024"])
+
+    assert df.empty
+    assert list(df.columns) == ["fund_name", "return", "aum", "strategy"]
+    assert bad_lines == ["Page 1 | of 3", "Confidential | 2024"]
+
+
+def test_no_candidate_lines():
+    df, bad_lines = _parse_lines(["just text", ""])
+
+    assert df.empty
+    assert bad_lines == []
+    assert df["return"].dtype == "float64"
+    assert isinstance(df["strategy"].dtype, pd.CategoricalDtype)